@@ -2,46 +2,116 @@
 Thin FastAPI wrapper around mlx-audio's Kokoro TTS pipeline.
 
 Exposes the same /dev/captioned_speech endpoint as Kokoro-FastAPI,
-returning base64-encoded WAV audio with word-level timestamps.
+returning base64-encoded MP3, WAV or raw 16-bit PCM audio with word-level
+timestamps. Two extra routes are not part of Kokoro-FastAPI:
+/dev/captioned_speech/binary returns the same data without base64, and
+/dev/captioned_speech/stream streams WAV or PCM audio as it is generated.
 
 Usage:
     uvicorn mlx_tts_server:app --host 127.0.0.1 --port 8880
 """
 
-import base64
-import io
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import struct
 import sys
+import threading
+from typing import Literal
 
+import anyio
+import lameenc
 import numpy as np
-import soundfile as sf
+import orjson
+import pybase64
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-app = FastAPI()
 
-# Lazy-load the model on first request to speed up server startup
+logger = logging.getLogger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load weights and run a tiny synthesis in the background so the first
+    # real request does not pay for loading and kernel compilation. Startup
+    # is not gated on it: the first run downloads the weights, and /health
+    # must answer meanwhile. Set MLX_TTS_WARMUP=0 to skip (e.g. in tests).
+    warm_up = None
+    if os.environ.get("MLX_TTS_WARMUP", "1") != "0":
+        warm_up = asyncio.create_task(_warm_up())
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# RIFF/data chunk size used when the final length is unknown (streaming)
+_WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+# 44-byte RIFF header for mono 16-bit PCM, see _wav_header_fields
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+# bf16 weights halve memory traffic versus fp32; override with MLX_TTS_MODEL
+_DEFAULT_MODEL = "mlx-community/Kokoro-82M-bf16"
+
+# Loaded by the startup warm-up, or on first request if that is disabled or
+# failed. Guarded so concurrent first callers do not load it twice.
 _model = None
+_model_load_lock = threading.Lock()
+
+# The model is not safe to drive from several threads at once; requests take
+# turns on it while the event loop stays free for everything else
+_model_lock = asyncio.Semaphore(1)
+
+# Synthesis tasks in flight, keyed by (input, voice, speed)
+_inflight: dict[tuple[str, str, float], asyncio.Task] = {}
 
 
 def get_model():
     global _model
-    if _model is None:
-        from mlx_audio.tts.utils import load_model
+    with _model_load_lock:
+        if _model is None:
+            from mlx_audio.tts.utils import load_model
 
-        _model = load_model("mlx-community/Kokoro-82M-bf16")
+            _model = load_model(os.environ.get("MLX_TTS_MODEL", _DEFAULT_MODEL))
     return _model
 
 
+async def _warm_up():
+    # Requests that arrive meanwhile queue on the lock instead of competing
+    # with the warm-up for the model
+    try:
+        async with _model_lock:
+            await anyio.to_thread.run_sync(_run_warm_up)
+    except Exception:
+        # Not fatal: requests will load the model lazily and report errors
+        logger.exception("TTS model warm-up failed")
+
+
+def _run_warm_up():
+    model = get_model()
+    for _ in model.generate(text="ok", voice="af_heart", speed=1.0, lang_code="a"):
+        pass
+
+
 class CaptionedSpeechRequest(BaseModel):
     model: str = "kokoro"
     input: str
     voice: str = "af_heart"
     speed: float = 1.0
-    response_format: str = "mp3"
+    response_format: Literal["mp3", "wav", "pcm_s16le"] = "mp3"
     stream: bool = False
 
 
+class StreamSpeechRequest(CaptionedSpeechRequest):
+    # Only uncompressed formats can be written incrementally
+    response_format: Literal["wav", "pcm_s16le"] = "wav"
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
@@ -55,79 +125,371 @@ async def models():
 @app.post("/dev/captioned_speech")
 async def captioned_speech(req: CaptionedSpeechRequest):
     try:
-        model = get_model()
-
-        # model.generate() is a generator yielding GenerationResult objects
-        # Each result has .audio (mx.array), .sample_rate (int), etc.
-        audio_segments = []
-        sample_rate = 24000
-
-        for result in model.generate(
-            text=req.input,
-            voice=req.voice,
-            speed=req.speed,
-            lang_code="a",
-        ):
-            audio_segments.append(np.array(result.audio))
-            sample_rate = result.sample_rate
-
-        if not audio_segments:
-            raise HTTPException(status_code=500, detail="No audio generated")
-
-        # Concatenate all segments into a single audio array
-        audio_array = np.concatenate(audio_segments)
-
-        # Encode audio as WAV
-        buf = io.BytesIO()
-        sf.write(buf, audio_array, sample_rate, format="WAV")
-        audio_b64 = base64.b64encode(buf.getvalue()).decode("ascii")
-
-        # Estimate word-level timestamps based on audio duration and word count.
-        # A future improvement could extract real timestamps from Kokoro's
-        # duration predictor (pred_dur) for more accurate word alignment.
-        timestamps = _estimate_word_timestamps(
-            req.input, len(audio_array) / sample_rate
-        )
+        pcm, sample_rate, timestamps = await _captioned_audio(req)
+        audio, mime = _encode_audio(pcm, sample_rate, req.response_format)
+        # orjson writes the large base64 string in C, much faster than the
+        # stdlib json behind JSONResponse
+        payload = {
+            "audio": pybase64.b64encode_as_string(audio),
+            "mime": mime,
+            "sample_rate": sample_rate,
+            "timestamps": timestamps,
+        }
+        return Response(orjson.dumps(payload), media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        return JSONResponse(
-            {
-                "audio": audio_b64,
-                "timestamps": timestamps,
-            }
+@app.post("/dev/captioned_speech/binary")
+async def captioned_speech_binary(req: CaptionedSpeechRequest):
+    """
+    Same as /dev/captioned_speech but skips base64. The body is a 4-byte
+    little-endian length N, then N bytes of timestamps JSON, then the encoded
+    audio. The timestamps are in the body rather than a header because a
+    header would grow with the text and pass client header limits. The audio
+    MIME type is in X-Audio-Type and the sample rate in X-Sample-Rate.
+
+    This framing is specific to this server, and no client uses it yet: the
+    VS Code extension's KokoroClient calls the JSON route.
+    """
+    try:
+        pcm, sample_rate, timestamps = await _captioned_audio(req)
+        timestamps_json = orjson.dumps(timestamps)
+        # The encoder writes the framing prefix into the same buffer as the
+        # audio, so the body is built with one allocation
+        body, mime = _encode_audio(
+            pcm,
+            sample_rate,
+            req.response_format,
+            prefix=(struct.pack("<I", len(timestamps_json)), timestamps_json),
+        )
+        return Response(
+            content=memoryview(body),
+            media_type="application/octet-stream",
+            headers={
+                "X-Audio-Type": mime,
+                "X-Sample-Rate": str(sample_rate),
+            },
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _captioned_audio(
+    req: CaptionedSpeechRequest,
+) -> tuple[np.ndarray, int, list[dict]]:
+    """Synthesize audio; returns (16-bit PCM, sample rate, timestamps)."""
+    # Concurrent requests for the same utterance share a single synthesis.
+    # Shielded so one client disconnecting does not cancel it for the others.
+    key = (req.input, req.voice, req.speed)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_synthesize_locked(req))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    audio_array, sample_rate, timestamps = await asyncio.shield(task)
+
+    # Quantize once; every output encoding works from the int16 samples,
+    # which are half the size of the float32 model output
+    pcm = _to_pcm16(audio_array)
+    del audio_array
+
+    # Fall back to estimating word timestamps from audio duration and word
+    # count when the pipeline did not time its tokens
+    if timestamps is None:
+        timestamps = _estimate_word_timestamps(req.input, len(pcm) / sample_rate)
+
+    return pcm, sample_rate, timestamps
+
+
+@app.post("/dev/captioned_speech/stream")
+async def captioned_speech_stream(req: StreamSpeechRequest):
+    """
+    Streams audio as each segment is synthesized instead of waiting for the
+    whole text. Only uncompressed formats can be streamed: "wav" sends a
+    header with unknown (0xFFFFFFFF) sizes followed by 16-bit PCM, and
+    "pcm_s16le" sends the samples alone. No timestamps are returned.
+    """
+    try:
+        # The first call loads weights from disk; keep that off the event loop
+        model = await anyio.to_thread.run_sync(get_model)
+        segments = _segments(model, req)
+        # Produce the first segment before responding, so failures and empty
+        # input get the same HTTP errors as the buffered endpoint
+        first = await _next_segment(segments)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if first is None:
+        raise HTTPException(status_code=500, detail="No audio generated")
+
+    async def generate_audio():
+        result = first
+        try:
+            if req.response_format == "wav":
+                yield _wav_header(model.sample_rate, _WAV_UNKNOWN_SIZE)
+            while result is not None:
+                # Zero-copy view of the segment; _to_pcm16 makes the only copy
+                yield _to_pcm16(np.asarray(result.output.audio[0])).tobytes()
+                result = await _next_segment(segments)
+        finally:
+            segments.close()
+
+    media_type = "audio/wav" if req.response_format == "wav" else "audio/pcm"
+    return StreamingResponse(generate_audio(), media_type=media_type)
+
+
+async def _next_segment(segments):
+    """
+    Advance a _segments() iterator by one segment; None when exhausted.
+    Holds the model only for that step, never across a yield to the client,
+    so a slow client cannot stall other requests. The step blocks, so it runs
+    in a worker thread.
+    """
+    async with _model_lock:
+        return await anyio.to_thread.run_sync(next, segments, None)
+
+
+async def _synthesize_locked(
+    req: CaptionedSpeechRequest,
+) -> tuple[np.ndarray, int, list[dict] | None]:
+    # Synthesis is blocking; run it off the event loop so health checks
+    # and other requests are still served while the model is busy
+    async with _model_lock:
+        return await anyio.to_thread.run_sync(_synthesize, req)
+
+
+def _synthesize(
+    req: CaptionedSpeechRequest,
+) -> tuple[np.ndarray, int, list[dict] | None]:
+    """
+    Run the model to completion and return (float32 audio, sample rate,
+    word timestamps). Timestamps are None when the pipeline did not time
+    its tokens, e.g. for languages without a token-level G2P.
+    """
+    model = get_model()
+    sample_rate = model.sample_rate
+    audio_segments = []
+    timestamps = []
+    offset = 0.0
+
+    for result in _segments(model, req):
+        # Keep the mx.array references; they are copied out once below
+        audio = result.output.audio[0]
+        audio_segments.append(audio)
+
+        if result.tokens is None:
+            timestamps = None
+        elif timestamps is not None:
+            timestamps.extend(
+                {
+                    "word": token.text,
+                    "start_time": round(offset + token.start_ts, 3),
+                    "end_time": round(offset + token.end_ts, 3),
+                }
+                for token in result.tokens
+                if token.start_ts is not None and token.end_ts is not None
+            )
+        # Token times are relative to their segment
+        offset += audio.shape[0] / sample_rate
+
+    if not audio_segments:
+        raise HTTPException(status_code=500, detail="No audio generated")
+
+    # Copy each segment straight into a single pre-sized buffer rather than
+    # converting each to numpy and then concatenating (two full copies)
+    total = sum(seg.shape[0] for seg in audio_segments)
+    audio_array = np.empty(total, dtype=np.float32)
+    offset = 0
+    for seg in audio_segments:
+        n = seg.shape[0]
+        # np.asarray views the mx.array through the buffer protocol, so the
+        # slice assignment is the only copy of the samples
+        audio_array[offset : offset + n] = np.asarray(seg)
+        offset += n
+
+    return audio_array, sample_rate, timestamps
+
+
+def _segments(model, req: CaptionedSpeechRequest):
+    """
+    Yield the Kokoro pipeline's results for a request, one per segment.
+
+    This drives the pipeline through the private model._get_pipeline()
+    rather than model.generate(), because generate() drops the tokens that
+    join_timestamps has already timed from the duration predictor
+    (start_ts/end_ts). Checked against mlx-audio 0.5.8. Like generate(), it
+    clears MLX's buffer cache after each segment so the cache does not stay
+    at its high-water mark between requests.
+    """
+    import mlx.core as mx
+
+    pipeline = model._get_pipeline("a")
+    for result in pipeline(req.input, voice=req.voice, speed=req.speed):
+        if result.output is None:
+            continue
+        yield result
+        mx.clear_cache()
+
+
+def _to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """Quantize float samples in [-1, 1] to little-endian 16-bit PCM."""
+    # Scale the clipped copy in place to avoid a second float temporary
+    pcm = np.clip(audio, -1.0, 1.0)
+    np.multiply(pcm, 32767, out=pcm)
+    # Explicit byte order: WAV and pcm_s16le are little-endian on any host
+    return pcm.astype("<i2")
+
+
+def _wav_header_fields(sample_rate: int, data_size: int) -> tuple:
+    """
+    Fields of a RIFF header for mono 16-bit PCM, for packing with
+    _WAV_HEADER. Pass _WAV_UNKNOWN_SIZE as data_size when the length is not
+    known up front.
+    """
+    riff_size = (
+        _WAV_UNKNOWN_SIZE if data_size == _WAV_UNKNOWN_SIZE else 36 + data_size
+    )
+    return (
+        b"RIFF",
+        riff_size,
+        b"WAVE",
+        b"fmt ",
+        16,  # fmt chunk size
+        1,  # PCM
+        1,  # mono
+        sample_rate,
+        sample_rate * 2,  # byte rate
+        2,  # block align
+        16,  # bits per sample
+        b"data",
+        data_size,
+    )
+
+
+def _wav_header(sample_rate: int, data_size: int) -> bytes:
+    """Build a standalone 44-byte RIFF header, see _wav_header_fields."""
+    return _WAV_HEADER.pack(*_wav_header_fields(sample_rate, data_size))
+
+
+def _encode_audio(
+    pcm: np.ndarray,
+    sample_rate: int,
+    response_format: str,
+    prefix: tuple[bytes, ...] = (),
+) -> tuple[bytearray | memoryview, str]:
+    """
+    Encode 16-bit PCM in the requested format; returns (data, MIME type).
+    Any `prefix` parts are written ahead of the audio in the same buffer.
+    Without a prefix, PCM data is a view of `pcm` rather than a copy.
+    """
+    if response_format == "mp3":
+        # The MP3 is a fraction of the PCM size, so joining it is cheap
+        return _with_prefix(prefix, _mp3_bytes(pcm, sample_rate)), "audio/mpeg"
+    if response_format == "wav":
+        return _wav_bytes(pcm, sample_rate, prefix), "audio/wav"
+    # pcm_s16le: headerless samples for clients that play PCM directly; they
+    # build their own format description from the returned sample rate
+    samples = memoryview(pcm).cast("B")
+    if not prefix:
+        return samples, "audio/pcm"
+    return _with_prefix(prefix, samples), "audio/pcm"
+
+
+def _with_prefix(prefix: tuple[bytes, ...], data) -> bytearray:
+    """Copy `prefix` parts followed by `data` into one new bytearray."""
+    buf = bytearray(sum(map(len, prefix)) + len(data))
+    _write_parts(buf, (*prefix, data))
+    return buf
+
+
+def _write_parts(buf: bytearray, parts) -> int:
+    """Copy `parts` back to back into the start of `buf`; returns the end."""
+    offset = 0
+    for part in parts:
+        buf[offset : offset + len(part)] = part
+        offset += len(part)
+    return offset
+
+
+def _mp3_bytes(pcm: np.ndarray, sample_rate: int) -> bytearray:
+    """
+    Encode 16-bit PCM as mono MP3. At 64 kbps this is roughly a sixth of the
+    WAV size, which shrinks the base64 step and the response accordingly.
+    """
+    encoder = lameenc.Encoder()
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(1)
+    encoder.set_bit_rate(64)
+    encoder.set_quality(5)
+    return encoder.encode(pcm.tobytes()) + encoder.flush()
+
+
+def _wav_bytes(
+    pcm: np.ndarray, sample_rate: int, prefix: tuple[bytes, ...] = ()
+) -> bytearray:
+    """
+    Encode 16-bit PCM samples as a mono WAV file, after any `prefix` parts.
+    Written by hand since a fixed 44-byte header plus the raw samples is all
+    a single PCM stream needs, without soundfile's format probing and seeks.
+    The output is allocated once and the samples are copied in once.
+    """
+    header_at = sum(map(len, prefix))
+    data_at = header_at + _WAV_HEADER.size
+    buf = bytearray(data_at + pcm.nbytes)
+    _write_parts(buf, prefix)
+    _WAV_HEADER.pack_into(buf, header_at, *_wav_header_fields(sample_rate, pcm.nbytes))
+    buf[data_at:] = memoryview(pcm).cast("B")
+    return buf
+
+
 def _estimate_word_timestamps(text: str, total_duration: float) -> list[dict]:
     """
     Estimate word-level timestamps by distributing duration proportional
     to character count. This is a fallback — real timestamps from the
     duration predictor are more accurate.
     """
+    return [
+        {"word": word, "start_time": start, "end_time": end}
+        for word, start, end in _word_timestamps_cached(
+            text, round(total_duration * 1000)
+        )
+    ]
+
+
+@functools.lru_cache(maxsize=1024)
+def _word_timestamps_cached(
+    text: str, duration_ms: int
+) -> tuple[tuple[str, float, float], ...]:
+    """
+    Cached core of _estimate_word_timestamps. Keyed on the duration in whole
+    milliseconds (the output resolution) so retries of the same text hit.
+    Returns immutable tuples so cached results cannot be mutated by callers.
+    """
     words = text.split()
     if not words:
-        return []
+        return ()
 
-    total_chars = sum(len(w) for w in words)
+    lens = np.fromiter(map(len, words), dtype=np.int32, count=len(words))
+    total_chars = int(lens.sum())
     if total_chars == 0:
-        return []
-
-    timestamps = []
-    current_time = 0.0
-    for word in words:
-        word_duration = (len(word) / total_chars) * total_duration
-        timestamps.append(
-            {
-                "word": word,
-                "start_time": round(current_time, 3),
-                "end_time": round(current_time + word_duration, 3),
-            }
-        )
-        current_time += word_duration
-
-    return timestamps
+        return ()
+
+    # Word end times are the cumulative character count scaled to the
+    # duration; each word starts where the previous one ended
+    ends = np.cumsum(lens, dtype=np.float64) * (duration_ms / 1000 / total_chars)
+    np.round(ends, 3, out=ends)
+    starts = np.empty_like(ends)
+    starts[0] = 0.0
+    starts[1:] = ends[:-1]
+
+    # tolist() yields Python floats in one C pass
+    return tuple(zip(words, starts.tolist(), ends.tolist()))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 import { exec as execCallback, spawn } from "node:child_process";
-import { existsSync } from "node:fs";
+import { existsSync, readFileSync } from "node:fs";
 import { mkdir, readFile, rm, writeFile } from "node:fs/promises";
 import { join, resolve } from "node:path";
 import { promisify } from "node:util";
@@ -8,6 +8,12 @@ import { findPython3, isPythonVersionOk } from "./platform.js";
 
 const exec = promisify(execCallback);
 
+/**
+ * Python packages the MLX wrapper script imports. Changing this list makes
+ * existing venvs stale, so they are reinstalled on the next start.
+ */
+export const MLX_REQUIREMENTS = '"mlx-audio[tts]" fastapi uvicorn pybase64 lameenc orjson';
+
 /** Directory for the managed MLX venv inside the config dir. */
 export function getVenvDir() {
   return resolve(getConfigDir(), "mlx-venv");
@@ -18,6 +24,11 @@ function getVenvPython() {
   return join(getVenvDir(), "bin", "python3");
 }
 
+/** Path to the stamp file recording which requirements the venv was built with. */
+function getRequirementsStamp() {
+  return join(getVenvDir(), "markservant-requirements.txt");
+}
+
 /** Path to the PID file for the MLX server process. */
 function getPidFile() {
   return resolve(getConfigDir(), "mlx-tts-server.pid");
@@ -30,12 +41,22 @@ function getWrapperScript() {
 }
 
 /**
- * Check if the MLX venv is set up with mlx-audio installed.
+ * Check if the MLX venv is set up with the current requirements installed.
+ * Venvs created by an older CLI (no stamp, or a different package list) are
+ * reported as not ready so setupVenv() reinstalls into them.
  * @returns {boolean}
  */
 export function isVenvReady() {
   const venvPython = getVenvPython();
-  return existsSync(venvPython);
+  const stamp = getRequirementsStamp();
+  if (!existsSync(venvPython) || !existsSync(stamp)) {
+    return false;
+  }
+  try {
+    return readFileSync(stamp, "utf-8").trim() === MLX_REQUIREMENTS;
+  } catch {
+    return false;
+  }
 }
 
 /**
@@ -75,9 +96,12 @@ export async function setupVenv(log) {
   // Install/upgrade dependencies
   log("Installing mlx-audio and dependencies (this may take a few minutes on first run)...");
   await exec(
-    `"${pip}" install --upgrade "mlx-audio[tts]" fastapi uvicorn soundfile`,
+    `"${pip}" install --upgrade ${MLX_REQUIREMENTS}`,
     { timeout: 600000 }, // 10 min — first install downloads ~500MB of MLX + models
   );
+
+  // Record what was installed so isVenvReady() can detect stale venvs
+  await writeFile(getRequirementsStamp(), MLX_REQUIREMENTS, "utf-8");
 }
 
 /**
@@ -1,5 +1,5 @@
 import { exec as execCallback, spawn } from "node:child_process";
-import { existsSync } from "node:fs";
+import { existsSync, readFileSync } from "node:fs";
 import { mkdir, readFile, rm, writeFile } from "node:fs/promises";
 import { beforeEach, describe, expect, it, vi } from "vitest";
 
@@ -11,6 +11,7 @@ vi.mock("node:child_process", () => ({
 
 vi.mock("node:fs", () => ({
   existsSync: vi.fn(),
+  readFileSync: vi.fn(),
 }));
 
 vi.mock("node:fs/promises", () => ({
@@ -32,6 +33,7 @@ vi.mock("./platform.js", () => ({
 const { findPython3, isPythonVersionOk } = await import("./platform.js");
 
 const {
+  MLX_REQUIREMENTS,
   getVenvDir,
   isVenvReady,
   setupVenv,
@@ -67,12 +69,17 @@ describe("mlx.js", () => {
   });
 
   describe("isVenvReady", () => {
-    it("returns true when venv python exists", () => {
+    it("returns true when venv python exists and requirements are current", () => {
       existsSync.mockReturnValue(true);
+      readFileSync.mockReturnValue(`${MLX_REQUIREMENTS}\n`);
 
       expect(isVenvReady()).toBe(true);
 
       expect(existsSync).toHaveBeenCalledWith("/mock/config/markservant/mlx-venv/bin/python3");
+      expect(readFileSync).toHaveBeenCalledWith(
+        "/mock/config/markservant/mlx-venv/markservant-requirements.txt",
+        "utf-8",
+      );
     });
 
     it("returns false when venv python does not exist", () => {
@@ -80,6 +87,20 @@ describe("mlx.js", () => {
 
       expect(isVenvReady()).toBe(false);
     });
+
+    it("returns false for a venv created before the requirements stamp", () => {
+      // Upgrade path: python exists but the stamp file does not
+      existsSync.mockImplementation((path) => path.endsWith("/bin/python3"));
+
+      expect(isVenvReady()).toBe(false);
+    });
+
+    it("returns false when the installed requirements are out of date", () => {
+      existsSync.mockReturnValue(true);
+      readFileSync.mockReturnValue('"mlx-audio[tts]" fastapi uvicorn soundfile');
+
+      expect(isVenvReady()).toBe(false);
+    });
   });
 
   describe("setupVenv", () => {
@@ -130,6 +151,27 @@ describe("mlx.js", () => {
       expect(execCallback).toHaveBeenCalledTimes(1);
       expect(mkdir).not.toHaveBeenCalled();
     });
+
+    it("installs current requirements and writes the stamp file", async () => {
+      findPython3.mockResolvedValue("/opt/homebrew/bin/python3");
+      isPythonVersionOk.mockResolvedValue(true);
+      existsSync.mockReturnValue(true);
+      mockExecSuccess("");
+      const log = vi.fn();
+
+      await setupVenv(log);
+
+      expect(execCallback).toHaveBeenCalledWith(
+        expect.stringContaining(`install --upgrade ${MLX_REQUIREMENTS}`),
+        expect.anything(),
+        expect.any(Function),
+      );
+      expect(writeFile).toHaveBeenCalledWith(
+        "/mock/config/markservant/mlx-venv/markservant-requirements.txt",
+        MLX_REQUIREMENTS,
+        "utf-8",
+      );
+    });
   });
 
   describe("startMlxServer", () => {
@@ -141,16 +183,18 @@ describe("mlx.js", () => {
 
     it("throws when wrapper script not found", async () => {
       existsSync.mockImplementation((p) => {
-        // Venv python exists, but wrapper script doesn't
-        if (p.includes("bin/python3")) return true;
+        // Venv is ready, but wrapper script doesn't exist
+        if (p.includes("bin/python3") || p.endsWith("markservant-requirements.txt")) return true;
         return false;
       });
+      readFileSync.mockReturnValue(MLX_REQUIREMENTS);
 
       await expect(startMlxServer(8880)).rejects.toThrow("wrapper script not found");
     });
 
     it("spawns detached process and writes PID file", async () => {
       existsSync.mockReturnValue(true);
+      readFileSync.mockReturnValue(MLX_REQUIREMENTS);
       const mockChild = { pid: 12345, unref: vi.fn() };
       spawn.mockReturnValue(mockChild);
       writeFile.mockResolvedValue(undefined);